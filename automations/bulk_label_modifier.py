@@ -4,19 +4,34 @@ import sys
 import os
 import argparse
 import json
+import random
+import time
+from collections import deque
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import httplib2
+from google.auth.exceptions import TransportError
 from googleapiclient.discovery import build
-from utilities import authenticate, get_labels_catalog, resolve_name_to_id, resolve_path_to_folder_id, list_files_in_folder
+from googleapiclient.errors import HttpError
+from utilities import authenticate, is_retryable_error, get_labels_catalog, resolve_name_to_id, resolve_path_to_folder_id, list_files_in_folder_all
 
 SCOPES = ["https://www.googleapis.com/auth/drive", "https://www.googleapis.com/auth/drive.labels"]
 SHARED_DRIVE_ID = "0ACLtKHNaf3uMUk9PVA"  # Hardcoded for now as per project convention
 
-def modify_label(service, file_id, label_id, field_id, choice_id):
-    """
-    Apply or update a selection-based label on a file.
-    """
-    body = {
+# Adaptive batch sizing (AIMD): grow after clean batches, halve on rate limit / 5xx
+BATCH_SIZE = 25  # starting size; Drive starts returning 500s on larger batches
+MIN_BATCH_SIZE = 5
+MAX_BATCH_SIZE = 100  # Drive's per-batch limit
+BATCH_SIZE_STEP = 5
+MAX_ATTEMPTS = 5  # per file, including replays after retryable errors
+
+# Network-level failures of a whole batch (timeouts, resets, DNS, token refresh);
+# treated like a 5xx: retryable, and they shrink the batch size
+NETWORK_ERRORS = (OSError, httplib2.HttpLib2Error, TransportError)
+
+def build_label_body(label_id, field_id, choice_id):
+    """Build the modifyLabels request body for a selection-based label."""
+    return {
         "labelModifications": [
             {
                 "labelId": label_id,
@@ -30,12 +45,84 @@ def modify_label(service, file_id, label_id, field_id, choice_id):
         ]
     }
 
-    try:
-        service.files().modifyLabels(fileId=file_id, body=body).execute()
-        return True
-    except Exception as e:
-        print(f"  ❌ Error modifying {file_id}: {e}")
-        return False
+def modify_labels_batched(service, files, label_id, field_id, choice_id, batch_size=BATCH_SIZE):
+    """
+    Apply the same selection-based label to many files using batch requests.
+    Sends one HTTP request per batch instead of one per file.
+
+    The batch size adapts like TCP congestion control: it grows by BATCH_SIZE_STEP
+    after a clean batch (up to MAX_BATCH_SIZE) and halves (down to MIN_BATCH_SIZE)
+    when Drive answers with 429/5xx; the affected files are replayed next, after
+    the largest Retry-After Drive sent (or a jittered exponential backoff).
+
+    Returns:
+        Number of files updated successfully.
+    """
+    body = build_label_body(label_id, field_id, choice_id)
+    names = {f['id']: f['name'] for f in files}
+    attempts = {}
+    to_replay = set()
+    retry_after = 0
+    success_count = 0
+    failed_count = 0
+
+    def callback(request_id, response, exception):
+        nonlocal success_count, failed_count, retry_after
+        if exception is None:
+            success_count += 1
+            return
+        attempts[request_id] = attempts.get(request_id, 0) + 1
+        if isinstance(exception, HttpError):
+            retryable = is_retryable_error(exception)
+        else:
+            retryable = isinstance(exception, NETWORK_ERRORS)
+        if retryable and attempts[request_id] < MAX_ATTEMPTS:
+            to_replay.add(request_id)
+            header = exception.resp.get('retry-after') if isinstance(exception, HttpError) else None
+            if header and header.isdigit():
+                retry_after = max(retry_after, int(header))
+        else:
+            failed_count += 1
+            print(f"  ❌ Error modifying '{names[request_id]}' ({request_id}): {exception}")
+
+    pending = list(files)
+    error_rates = deque(maxlen=10)  # rolling window of per-batch retryable error rates
+    backoff_level = 0
+    while pending:
+        group, pending = pending[:batch_size], pending[batch_size:]
+        to_replay.clear()
+        retry_after = 0
+        batch = service.new_batch_http_request(callback=callback)
+        for file in group:
+            batch.add(service.files().modifyLabels(fileId=file['id'], body=body), request_id=file['id'])
+        try:
+            # No execute_with_retry here: this loop is the only retry/backoff layer,
+            # so a failing batch size is halved on the first whole-batch error
+            batch.execute()
+        except Exception as e:
+            # Whole batch failed: report it for every file so retryable ones are
+            # replayed and anything else is counted as failed (the run continues)
+            for file in group:
+                callback(file['id'], None, e)
+
+        error_rates.append(len(to_replay) / len(group))
+        print(f"[{success_count + failed_count}/{len(files)}] Batch of {len(group)} files, "
+              f"{len(to_replay)} to retry", flush=True)
+
+        if to_replay:
+            batch_size = max(MIN_BATCH_SIZE, batch_size // 2)
+            pending = [file for file in group if file['id'] in to_replay] + pending
+            time.sleep(retry_after or min(64, 2 ** backoff_level) + random.uniform(0, 1))
+            backoff_level += 1
+        else:
+            batch_size = min(MAX_BATCH_SIZE, batch_size + BATCH_SIZE_STEP)
+            backoff_level = 0
+
+    if error_rates:
+        avg_error_rate = sum(error_rates) / len(error_rates)
+        print(f"  -> Final batch size: {batch_size} (recent retry rate {avg_error_rate:.0%})")
+
+    return success_count
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Bulk modify labels on all files in a folder.')
@@ -43,6 +130,8 @@ if __name__ == "__main__":
     parser.add_argument('label_name_or_id', help='The Name or ID of the label to apply')
     parser.add_argument('field_name_or_id', help='The Name or ID of the field to set')
     parser.add_argument('choice_name_or_id', help='The Name or ID of the selection choice')
+    parser.add_argument('--refresh-catalog', action='store_true', help='Ignore the cached label catalog and fetch it again')
+    parser.add_argument('--refresh-folders', action='store_true', help='Ignore cached folder path lookups')
 
     args = parser.parse_args()
 
@@ -55,7 +144,7 @@ if __name__ == "__main__":
     # 2. Resolve Folder
     print(f"Resolving folder path: '{args.folder_path}'...")
     try:
-        folder_id = resolve_path_to_folder_id(drive_service, SHARED_DRIVE_ID, args.folder_path)
+        folder_id = resolve_path_to_folder_id(drive_service, SHARED_DRIVE_ID, args.folder_path, refresh=args.refresh_folders)
         print(f"  -> Found Folder ID: {folder_id}")
     except Exception as e:
         print(f"❌ Error resolving folder: {e}")
@@ -63,28 +152,32 @@ if __name__ == "__main__":
 
     # 3. Resolve Label/Field/Choice
     print("Fetching label catalog...")
-    catalog = get_labels_catalog(labels_service)
+    catalog = get_labels_catalog(labels_service, refresh=args.refresh_catalog)
     
     print(f"Resolving label details...")
-    label_id = resolve_name_to_id(catalog, args.label_name_or_id, "label")
-    label_info = catalog[label_id]
+    try:
+        label_id = resolve_name_to_id(catalog, args.label_name_or_id, "label")
+        label_info = catalog[label_id]
     
-    fields_dict = label_info.get('fields', {})
-    field_id = resolve_name_to_id(fields_dict, args.field_name_or_id, "field", fields_dict)
-    field_info = fields_dict[field_id]
+        fields_dict = label_info.get('fields', {})
+        field_id = resolve_name_to_id(fields_dict, args.field_name_or_id, "field", label_info.get('fieldsByName'))
+        field_info = fields_dict[field_id]
     
-    choices_dict = field_info.get('choices', {})
-    if not choices_dict:
-         print(f"❌ Field '{field_info['displayName']}' does not appear to be a selection field.")
-         sys.exit(1)
-    choice_id = resolve_name_to_id(choices_dict, args.choice_name_or_id, "choice", choices_dict)
-    choice_info = choices_dict[choice_id]
+        choices_dict = field_info.get('choices', {})
+        if not choices_dict:
+             print(f"❌ Field '{field_info['displayName']}' does not appear to be a selection field.")
+             sys.exit(1)
+        choice_id = resolve_name_to_id(choices_dict, args.choice_name_or_id, "choice", field_info.get('choicesByName'))
+        choice_info = choices_dict[choice_id]
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
 
     print(f"  -> Target: Label='{label_info['displayName']}', Field='{field_info['displayName']}', Value='{choice_info['displayName']}'")
 
     # 4. List Files
     print(f"Listing files in folder...")
-    files = list_files_in_folder(drive_service, SHARED_DRIVE_ID, folder_id)
+    files = list_files_in_folder_all(drive_service, SHARED_DRIVE_ID, folder_id)
     print(f"  -> Found {len(files)} files.")
 
     if not files:
@@ -93,14 +186,6 @@ if __name__ == "__main__":
 
     # 5. Apply Updates
     print(f"\nStarting bulk update on {len(files)} files...")
-    success_count = 0
-    
-    for i, file in enumerate(files, 1):
-        print(f"[{i}/{len(files)}] Updating '{file['name']}'...", end='', flush=True)
-        if modify_label(drive_service, file['id'], label_id, field_id, choice_id):
-            print(" ✅")
-            success_count += 1
-        else:
-            print(" ❌")
+    success_count = modify_labels_batched(drive_service, files, label_id, field_id, choice_id)
 
     print(f"\n✅ Completed! Successfully updated {success_count}/{len(files)} files.")
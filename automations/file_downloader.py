@@ -2,7 +2,6 @@
 
 import sys
 import os
-import io
 import argparse
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
@@ -11,15 +10,18 @@ from googleapiclient.http import MediaIoBaseDownload
 from utilities import authenticate
 
 SCOPES = ["https://www.googleapis.com/auth/drive"]
+CHUNK_SIZE = 8 * 1024 * 1024  # Bytes per request; each chunk is written to disk as it arrives
 
-def download_file(file_id, destination_path=None):
+def download_file(file_id, destination_path=None, service=None):
     """
     Download a file from Drive.
     If it's a Google Doc/Sheet/Slide, export to PDF.
     If it's a binary file, download directly.
+    Pass a prebuilt Drive `service` when downloading many files in a loop.
     """
-    creds = authenticate(SCOPES)
-    service = build("drive", "v3", credentials=creds)
+    if service is None:
+        creds = authenticate(SCOPES)
+        service = build("drive", "v3", credentials=creds)
 
     try:
         # 1. Get file metadata
@@ -57,18 +59,24 @@ def download_file(file_id, destination_path=None):
         else:
             save_path = os.path.join(os.getcwd(), final_name)
 
-        # 4. Execute Download
-        fh = io.BytesIO()
-        downloader = MediaIoBaseDownload(fh, request)
-        done = False
-        while done is False:
-            status, done = downloader.next_chunk()
-            if status:
-                print(f"  -> Download {int(status.progress() * 100)}%.")
-
-        # 5. Save to disk
-        with open(save_path, 'wb') as f:
-            f.write(fh.getbuffer())
+        # 4. Stream download to a temp file next to the destination (memory use
+        # stays at one chunk), then move it into place only once it is complete
+        part_path = f"{save_path}.part"
+        fh = open(part_path, 'wb')
+        try:
+            with fh:
+                downloader = MediaIoBaseDownload(fh, request, chunksize=CHUNK_SIZE)
+                done = False
+                while done is False:
+                    status, done = downloader.next_chunk(num_retries=3)
+                    if status:
+                        print(f"  -> Download {int(status.progress() * 100)}%.")
+            os.replace(part_path, save_path)
+        except BaseException:
+            # Leave any existing file at save_path untouched; drop only our temp file
+            if os.path.isfile(part_path):
+                os.remove(part_path)
+            raise
 
         print(f"✅ Download complete! Saved to: {save_path}")
         return True
@@ -1,18 +1,20 @@
 """List files in a specific Google Drive folder - standalone script."""
 
 import os
-import json
 import sys
+import argparse
+import time
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from googleapiclient.discovery import build
-from googleapiclient.discovery import build
-from utilities import authenticate, resolve_path_to_folder_id, list_files_in_folder, get_file_labels, get_labels_catalog
-from pygments import highlight
-from pygments.lexers import JsonLexer
-from pygments.formatters import TerminalFormatter
+from utilities import authenticate, resolve_path_to_folder_id, list_files_in_folder, list_files_in_folder_all, describe_labels, get_file_labels, get_labels_catalog_info
+import orjson
+
 
 
+# Created on first colored print (pygments is imported lazily)
+_JSON_LEXER = None
+_TERM_FMT = None
 
 SCOPES = [
     "https://www.googleapis.com/auth/drive",
@@ -24,12 +26,14 @@ SHARED_DRIVE_ID = "0ACLtKHNaf3uMUk9PVA"
 
 
 
-def list_folder_files(folder_path):
+def list_folder_files(folder_path, refresh_catalog=False, refresh_folders=False):
     """
     List all files in a specific folder path with their labels.
 
     Args:
         folder_path: Path relative to drive root (e.g., "Reports/2024" or "" for root)
+        refresh_catalog: If True, bypass the on-disk labels catalog cache
+        refresh_folders: If True, bypass the on-disk folder path cache
 
     Returns:
         Dictionary with folder info and list of file metadata with labels
@@ -38,54 +42,85 @@ def list_folder_files(folder_path):
     drive_service = build("drive", "v3", credentials=creds)
     labels_service = build("drivelabels", "v2", credentials=creds)
 
-    # Get labels catalog once (optimization: single API call)
+    # Get labels catalog once: read from the disk cache when fresh,
+    # otherwise fetched from the API (paginated) and cached
     print("Loading labels catalog...")
-    labels_catalog = get_labels_catalog(labels_service)
+    labels_catalog, catalog_cached_at = get_labels_catalog_info(labels_service, refresh_catalog)
     print(f"Loaded {len(labels_catalog)} labels from catalog")
 
     # Resolve folder path to folder ID
     if folder_path:
-        folder_id = resolve_path_to_folder_id(drive_service, SHARED_DRIVE_ID, folder_path)
+        folder_id = resolve_path_to_folder_id(drive_service, SHARED_DRIVE_ID, folder_path, refresh=refresh_folders)
     else:
         # Empty path means root of shared drive
         folder_id = SHARED_DRIVE_ID
 
-    # List files in the folder
-    files = list_files_in_folder(drive_service, SHARED_DRIVE_ID, folder_id)
-
-    # Get labels for each file using the cached catalog
-    for file in files:
-        file_id = file.get('id')
-        if file_id:
-            labels = get_file_labels(drive_service, file_id, labels_catalog)
-            file['labels'] = labels
-
-    return {
+    if labels_catalog:
+        # List files in the folder, with applied labels included in the same response,
+        # resolving label display names locally as each page arrives
+        files = []
+        for file in list_files_in_folder(
+            drive_service, SHARED_DRIVE_ID, folder_id, include_label_ids=list(labels_catalog.keys())
+        ):
+            label_info = file.pop('labelInfo', {})
+            file['labels'] = describe_labels(label_info.get('labels', []), labels_catalog)
+            files.append(file)
+    else:
+        # Without label IDs includeLabels can't be used; fall back to one
+        # listLabels call per file so no applied label is dropped
+        print("⚠️ Labels catalog unavailable; fetching labels file by file")
+        files = list_files_in_folder_all(drive_service, SHARED_DRIVE_ID, folder_id)
+        for file in files:
+            file['labels'] = get_file_labels(drive_service, file['id'], labels_catalog)
+
+    result = {
         "folder_path": folder_path or "(root)",
         "folder_id": folder_id,
         "file_count": len(files),
         "files": files
     }
-
-def print_colored_json(data):
-    """Print JSON data with syntax highlighting."""
-    json_str = json.dumps(data, indent=2, ensure_ascii=False)
-    colored_json = highlight(json_str, JsonLexer(), TerminalFormatter())
-    print(colored_json)
+    if labels_catalog and catalog_cached_at:
+        # includeLabels only covers labels known to the catalog
+        age_min = int((time.time() - catalog_cached_at) // 60)
+        result["labels_note"] = (
+            f"Labels catalog read from cache ({age_min} min old); labels published since then "
+            "are not shown. Use --refresh-catalog to include them."
+        )
+    return result
+
+def print_colored_json(data, color=True):
+    """Print JSON data with syntax highlighting (plain if color=False or stdout is not a terminal)."""
+    global _JSON_LEXER, _TERM_FMT
+    json_str = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+    if not color or not sys.stdout.isatty():
+        print(json_str)
+        return
+
+    from pygments import highlight
+    from pygments.lexers import JsonLexer
+    from pygments.formatters import TerminalFormatter
+    if _JSON_LEXER is None:
+        _JSON_LEXER = JsonLexer()
+        _TERM_FMT = TerminalFormatter()
+    print(highlight(json_str, _JSON_LEXER, _TERM_FMT))
 
 if __name__ == "__main__":
-    # Get folder path from command line argument or use root
-    if len(sys.argv) > 1:
-        folder_path = sys.argv[1]
-    else:
-        print("Usage: python automations/folder_lister.py <folder_path>")
-        print("Example: python automations/folder_lister.py 'Reports/2024'")
-        print("Example: python automations/folder_lister.py '' (for root)")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        description='List files in a folder with their labels.',
+        epilog="Examples: folder_lister.py 'Reports/2024'  |  folder_lister.py '' (for root)"
+    )
+    parser.add_argument('folder_path', help='Path to the folder relative to drive root ("" for root)')
+    parser.add_argument('--refresh-catalog', action='store_true', help='Ignore the cached label catalog and fetch it again')
+    parser.add_argument('--refresh-folders', action='store_true', help='Ignore cached folder path lookups')
+    parser.add_argument('--no-color', action='store_true', help='Print plain JSON without syntax highlighting')
+
+    args = parser.parse_args()
 
     try:
-        result = list_folder_files(folder_path)
-        print_colored_json(result)
+        result = list_folder_files(
+            args.folder_path, refresh_catalog=args.refresh_catalog, refresh_folders=args.refresh_folders
+        )
+        print_colored_json(result, color=not args.no_color)
     except FileNotFoundError as e:
         print(f"❌ Error: {e}")
         sys.exit(1)
@@ -54,6 +54,7 @@ if __name__ == "__main__":
     parser.add_argument('label_name_or_id', help='The Name or ID of the label to apply')
     parser.add_argument('field_name_or_id', help='The Name or ID of the field to set')
     parser.add_argument('choice_name_or_id', help='The Name or ID of the selection choice')
+    parser.add_argument('--refresh-catalog', action='store_true', help='Ignore the cached label catalog and fetch it again')
 
     args = parser.parse_args()
 
@@ -61,31 +62,35 @@ if __name__ == "__main__":
     print("Authenticating and fetching catalog...")
     creds = authenticate(SCOPES)
     labels_service = build("drivelabels", "v2", credentials=creds)
-    catalog = get_labels_catalog(labels_service)
+    catalog = get_labels_catalog(labels_service, refresh=args.refresh_catalog)
     
-    # Resolve Label
-    print(f"Resolving label '{args.label_name_or_id}'...")
-    label_id = resolve_name_to_id(catalog, args.label_name_or_id, "label")
-    label_info = catalog[label_id]
-    print(f"  -> Found Label: {label_info['displayName']} ({label_id})")
+    try:
+        # Resolve Label
+        print(f"Resolving label '{args.label_name_or_id}'...")
+        label_id = resolve_name_to_id(catalog, args.label_name_or_id, "label")
+        label_info = catalog[label_id]
+        print(f"  -> Found Label: {label_info['displayName']} ({label_id})")
 
-    # Resolve Field
-    print(f"Resolving field '{args.field_name_or_id}'...")
-    fields_dict = label_info.get('fields', {})
-    field_id = resolve_name_to_id(fields_dict, args.field_name_or_id, "field", fields_dict)
-    field_info = fields_dict[field_id]
-    print(f"  -> Found Field: {field_info['displayName']} ({field_id})")
+        # Resolve Field
+        print(f"Resolving field '{args.field_name_or_id}'...")
+        fields_dict = label_info.get('fields', {})
+        field_id = resolve_name_to_id(fields_dict, args.field_name_or_id, "field", label_info.get('fieldsByName'))
+        field_info = fields_dict[field_id]
+        print(f"  -> Found Field: {field_info['displayName']} ({field_id})")
 
-    # Resolve Choice
-    print(f"Resolving choice '{args.choice_name_or_id}'...")
-    choices_dict = field_info.get('choices', {})
-    if not choices_dict:
-         print(f"❌ Field '{field_info['displayName']}' does not appear to be a selection field or has no choices.")
-         sys.exit(1)
+        # Resolve Choice
+        print(f"Resolving choice '{args.choice_name_or_id}'...")
+        choices_dict = field_info.get('choices', {})
+        if not choices_dict:
+             print(f"❌ Field '{field_info['displayName']}' does not appear to be a selection field or has no choices.")
+             sys.exit(1)
          
-    choice_id = resolve_name_to_id(choices_dict, args.choice_name_or_id, "choice", choices_dict)
-    choice_info = choices_dict[choice_id]
-    print(f"  -> Found Choice: {choice_info['displayName']} ({choice_id})")
+        choice_id = resolve_name_to_id(choices_dict, args.choice_name_or_id, "choice", field_info.get('choicesByName'))
+        choice_info = choices_dict[choice_id]
+        print(f"  -> Found Choice: {choice_info['displayName']} ({choice_id})")
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
 
     print(f"\nModifying file {args.file_id}...")
     
@@ -2,14 +2,16 @@
 
 import sys
 import os
-import json
+import argparse
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from googleapiclient.discovery import build
 from utilities import authenticate
-from pygments import highlight
-from pygments.lexers import JsonLexer
-from pygments.formatters import TerminalFormatter
+import orjson
+
+# Created on first colored print (pygments is imported lazily)
+_JSON_LEXER = None
+_TERM_FMT = None
 
 SCOPES = [
     "https://www.googleapis.com/auth/drive",
@@ -24,12 +26,26 @@ def list_labels():
     labels_api = build("drivelabels", "v2", credentials=creds)
     return labels_api.labels().list(view="LABEL_VIEW_FULL").execute()
 
-def print_colored_json(data):
-    """Print JSON data with syntax highlighting."""
-    json_str = json.dumps(data, indent=2, ensure_ascii=False)
-    colored_json = highlight(json_str, JsonLexer(), TerminalFormatter())
-    print(colored_json)
+def print_colored_json(data, color=True):
+    """Print JSON data with syntax highlighting (plain if color=False or stdout is not a terminal)."""
+    global _JSON_LEXER, _TERM_FMT
+    json_str = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+    if not color or not sys.stdout.isatty():
+        print(json_str)
+        return
+
+    from pygments import highlight
+    from pygments.lexers import JsonLexer
+    from pygments.formatters import TerminalFormatter
+    if _JSON_LEXER is None:
+        _JSON_LEXER = JsonLexer()
+        _TERM_FMT = TerminalFormatter()
+    print(highlight(json_str, _JSON_LEXER, _TERM_FMT))
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='List all Drive labels.')
+    parser.add_argument('--no-color', action='store_true', help='Print plain JSON without syntax highlighting')
+    args = parser.parse_args()
+
     labels_data = list_labels()
-    print_colored_json(labels_data)
\ No newline at end of file
+    print_colored_json(labels_data, color=not args.no_color)
\ No newline at end of file
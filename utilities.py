@@ -3,18 +3,49 @@ Google Drive API utilities for folder and file operations.
 """
 
 import os
+import re
+import json
+import random
+import time
 from googleapiclient.discovery import build, Resource
+from googleapiclient.errors import HttpError
 from google.oauth2.credentials import Credentials
+from google.oauth2 import service_account
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 
 FOLDER_MIME = "application/vnd.google-apps.folder"
 
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 6
+
+# Local cache for rarely-changing metadata (e.g. the labels catalog)
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "gdrive-automations")
+LABELS_CATALOG_MAX_AGE_S = 3600
+FOLDER_TREE_CACHE = os.path.join(CACHE_DIR, "folder_tree.json")
+FOLDER_TREE_MAX_AGE_S = 24 * 3600
+
+# Only the label properties the catalog actually uses (partial response)
+LABELS_CATALOG_FIELDS = (
+    "nextPageToken, labels(id, properties(title), "
+    "fields(id, properties(displayName), selectionOptions(choices(id, properties(displayName)))))"
+)
+
+
+
+# Credentials already loaded in this process, keyed by frozenset(scopes)
+_CREDS_CACHE = {}
 
 
 def authenticate(scopes):
     """
     Handle OAuth2 authentication and return the credentials object.
+    Credentials are cached per process, so repeated calls with the same scopes
+    don't re-read token.json while the access token is still valid.
+
+    If GOOGLE_SERVICE_ACCOUNT_JSON points to a service account key file, it is
+    used instead of the interactive OAuth flow (for headless/CI runs). Set
+    GDRIVE_DELEGATE_USER to impersonate a user via domain-wide delegation.
     
     Args:
         scopes: List of permission scopes required.
@@ -22,6 +53,22 @@ def authenticate(scopes):
     Returns:
         Authenticated Credentials object.
     """
+    cache_key = frozenset(scopes)
+    creds = _CREDS_CACHE.get(cache_key)
+    if creds and creds.valid:
+        return creds
+
+    service_account_file = os.environ.get('GOOGLE_SERVICE_ACCOUNT_JSON')
+    if service_account_file:
+        # Service account credentials fetch and refresh their own tokens on first use
+        if not creds:
+            creds = service_account.Credentials.from_service_account_file(service_account_file, scopes=scopes)
+            delegate_user = os.environ.get('GDRIVE_DELEGATE_USER')
+            if delegate_user:
+                creds = creds.with_subject(delegate_user)
+            _CREDS_CACHE[cache_key] = creds
+        return creds
+
     # Navigate to parent directory where token.json lives
     # This handles cases where script is run from different directories
     # We assume utilities.py is in the project root or one level deep, 
@@ -40,8 +87,8 @@ def authenticate(scopes):
     token_path = os.path.join(project_root, 'token.json')
     credentials_path = os.path.join(project_root, 'credentials.json')
 
-    creds = None
-    if os.path.exists(token_path):
+    # Expired cached credentials can be refreshed without re-reading the file
+    if not creds and os.path.exists(token_path):
         creds = Credentials.from_authorized_user_file(token_path, scopes)
 
     if not creds or not creds.valid:
@@ -51,15 +98,68 @@ def authenticate(scopes):
             flow = InstalledAppFlow.from_client_secrets_file(credentials_path, scopes)
             creds = flow.run_local_server(port=0)
 
+        # Only written when the token actually changed (refresh or new login)
         with open(token_path, 'w') as token:
             token.write(creds.to_json())
 
+    _CREDS_CACHE[cache_key] = creds
     return creds
 
 
+def is_retryable_error(error):
+    """True for rate limit (429, or 403 *RateLimitExceeded) and transient 5xx errors."""
+    status = error.resp.status
+    if status in RETRYABLE_STATUSES:
+        return True
+    return status == 403 and b'ratelimitexceeded' in (error.content or b'').lower()
+
+
+def execute_with_retry(request, max_retries=MAX_RETRIES):
+    """
+    Execute an API request (or batch), retrying rate limit and transient errors.
+    Honors the server's Retry-After header, otherwise uses jittered exponential backoff.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return request.execute()
+        except HttpError as e:
+            if attempt == max_retries or not is_retryable_error(e):
+                raise
+            retry_after = e.resp.get('retry-after')
+            if retry_after and retry_after.isdigit():
+                delay = int(retry_after)
+            else:
+                delay = min(64, 2 ** attempt) + random.uniform(0, 1)
+            print(f"  ⏳ HTTP {e.resp.status}, retrying in {delay:.1f}s ({attempt + 1}/{max_retries})...")
+            time.sleep(delay)
+
+
+def _load_cached_json(path, max_age_s=None):
+    """Return the JSON stored at `path` if it is younger than `max_age_s` (None = any age), else None."""
+    try:
+        if max_age_s is not None and time.time() - os.path.getmtime(path) > max_age_s:
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_cached_json(path, data):
+    """Write `data` as JSON to `path` atomically (temp file + rename)."""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"  ⚠️ Could not write cache {path}: {e}")
+
+
 def get_child_folder_id(service, drive_id, parent_id, child_name):
     """Return the ID of a child folder named `child_name` under `parent_id`."""
-    res = service.files().list(
+    res = execute_with_retry(service.files().list(
         corpora="drive",
         driveId=drive_id,
         includeItemsFromAllDrives=True,
@@ -70,34 +170,66 @@ def get_child_folder_id(service, drive_id, parent_id, child_name):
             f"name = '{child_name}' and trashed=false"
         ),
         fields="files(id, name, parents)"
-    ).execute()
+    ))
     matches = res.get("files", [])
     if not matches:
         raise FileNotFoundError(f"Folder not found: '{child_name}' under {parent_id}")
     return matches[0]["id"]
 
 
-def resolve_path_to_folder_id(service, drive_id, path):
+def resolve_path_to_folder_id(service, drive_id, path, refresh=False):
     """
     Resolve a nested folder path like 'Reports/2024/April' (relative to drive root)
     into a folder ID. For Shared drives, the drive root is the folder with ID==drive_id.
+
+    Resolved paths (and every intermediate prefix) are cached on disk for
+    FOLDER_TREE_MAX_AGE_S seconds, so only uncached segments hit the API.
+    Pass refresh=True to ignore the cache.
     """
     parent_id = drive_id  # root of Shared drive
     parts = [p for p in path.split("/") if p]  # ignore empty segments
-    for name in parts:
-        parent_id = get_child_folder_id(service, drive_id, parent_id, name)
+
+    now = time.time()
+    cache = _load_cached_json(FOLDER_TREE_CACHE) or {}
+    cache = {k: v for k, v in cache.items() if now - v.get('cachedAt', 0) < FOLDER_TREE_MAX_AGE_S}
+
+    # Start from the deepest cached prefix
+    start = 0
+    for depth in range(0 if refresh else len(parts), 0, -1):
+        entry = cache.get(f"{drive_id}/{'/'.join(parts[:depth])}")
+        if entry:
+            parent_id, start = entry['id'], depth
+            break
+
+    if start == len(parts):
+        return parent_id
+
+    for depth in range(start + 1, len(parts) + 1):
+        parent_id = get_child_folder_id(service, drive_id, parent_id, parts[depth - 1])
+        cache[f"{drive_id}/{'/'.join(parts[:depth])}"] = {'id': parent_id, 'cachedAt': now}
+
+    _save_cached_json(FOLDER_TREE_CACHE, cache)
     return parent_id
 
 
-def list_files_in_folder(service, drive_id, folder_id, page_size=100):
+def list_files_in_folder(service, drive_id, folder_id, page_size=1000, include_label_ids=None):
     """
-    Return a list of file dictionaries with metadata from folder_id.
-    Includes pagination to retrieve *all* results.
+    Yield file dictionaries with metadata from folder_id, one page at a time.
+    Includes pagination to retrieve *all* results; callers can start working on
+    the first page before later pages are fetched.
+
+    If include_label_ids is given, the applied values of those labels are
+    returned in each file's 'labelInfo' (no per-file listLabels call needed).
     """
-    files = []
+    file_fields = "id, name, mimeType, size, modifiedTime, owners(displayName)"
+    extra_params = {}
+    if include_label_ids:
+        file_fields += ", labelInfo(labels(id, fields))"
+        extra_params["includeLabels"] = ",".join(include_label_ids)
+
     page_token = None
     while True:
-        res = service.files().list(
+        res = execute_with_retry(service.files().list(
             corpora="drive",
             driveId=drive_id,
             includeItemsFromAllDrives=True,
@@ -106,68 +238,144 @@ def list_files_in_folder(service, drive_id, folder_id, page_size=100):
             pageSize=page_size,
             pageToken=page_token,
             # Adjust fields as needed:
-            fields=(
-                "nextPageToken, "
-                "files(id, name, mimeType, size, modifiedTime, owners(displayName))"
-            ),
-            orderBy="folder,name_natural"  # optional: friendly sort
-        ).execute()
-
-        files.extend(res.get("files", []))
+            fields=f"nextPageToken, files({file_fields})",
+            orderBy="folder,name_natural",  # optional: friendly sort
+            **extra_params
+        ))
+
+        yield from res.get("files", [])
         page_token = res.get("nextPageToken")
         if not page_token:
             break
-    return files
 
 
-def resolve_name_to_id(catalog, name, type_desc, context_dict=None):
+def list_files_in_folder_all(*args, **kwargs):
+    """Return list_files_in_folder() results as a list."""
+    return list(list_files_in_folder(*args, **kwargs))
+
+
+def build_name_index(entries):
+    """
+    Map lowercased displayName -> list of IDs for a dict of catalog entries
+    (labels, fields or choices). A list keeps ambiguous names detectable.
+    """
+    index = {}
+    for id_val, data in entries.items():
+        index.setdefault(data.get('displayName', '').lower(), []).append(id_val)
+    return index
+
+
+def resolve_name_to_id(entries, name, type_desc, name_index=None):
     """
     Resolve a name to an ID using the catalog.
     If name matches an ID directly, return it.
-    Otherwise, search for a matching displayName (case-insensitive).
+    Otherwise, look up a matching displayName (case-insensitive).
+
+    Args:
+        entries: Dict of catalog entries keyed by ID (labels, fields or choices)
+        name: Name or ID to resolve
+        type_desc: Description used in error messages ("label", "field", ...)
+        name_index: Precomputed build_name_index(entries); built on the fly if None
+
+    Raises:
+        ValueError: If the name is ambiguous or not found.
     """
-    # 1. Check if it's already an ID (simple heuristic: usually long strings)
-    # But we also check if it exists as a key in the context
-    search_dict = context_dict if context_dict else catalog
-    
-    if name in search_dict:
+    # 1. Already an ID
+    if name in entries:
         return name
 
-    # 2. Search by display name
-    matches = []
-    for id_val, data in search_dict.items():
-        if data.get('displayName', '').lower() == name.lower():
-            matches.append(id_val)
-    
+    # 2. Look up by display name
+    if name_index is None:
+        name_index = build_name_index(entries)
+    matches = name_index.get(name.lower(), [])
+
     if len(matches) == 1:
         return matches[0]
-    elif len(matches) > 1:
-        print(f"❌ Ambiguous {type_desc} name: '{name}'. Matches: {matches}")
-        sys.exit(1)
-    
-    # 3. If no match found, maybe it's an ID that wasn't in the top-level keys 
-    # (though for catalog/fields/choices it should be).
-    # We'll assume if it looks like an ID, it might be one we missed or raw input.
-    # But for safety, if we can't find it by name and it's not a key, we warn.
-    print(f"❌ Could not find {type_desc} with name or ID: '{name}'")
-    sys.exit(1)
+    if len(matches) > 1:
+        raise ValueError(f"Ambiguous {type_desc} name: '{name}'. Matches: {matches}")
+    raise ValueError(f"Could not find {type_desc} with name or ID: '{name}'")
+
+
+def _credentials_identity():
+    """
+    Name of the identity authenticate() runs as: the delegated user or service
+    account email when GOOGLE_SERVICE_ACCOUNT_JSON is set, otherwise "oauth".
+    """
+    service_account_file = os.environ.get('GOOGLE_SERVICE_ACCOUNT_JSON')
+    if not service_account_file:
+        return "oauth"
+    delegate_user = os.environ.get('GDRIVE_DELEGATE_USER')
+    if delegate_user:
+        return delegate_user
+    try:
+        with open(service_account_file, 'r', encoding='utf-8') as f:
+            return json.load(f).get('client_email', 'service-account')
+    except (OSError, ValueError):
+        return "service-account"
+
 
+def _labels_catalog_cache_path():
+    """Per-identity catalog cache file, since each identity may see different labels."""
+    identity = re.sub(r'[^A-Za-z0-9@._-]', '_', _credentials_identity())
+    return os.path.join(CACHE_DIR, f"labels_catalog-{identity}.json")
 
-def get_labels_catalog(labels_service):
+
+def get_labels_catalog(labels_service, refresh=False):
     """
     Get the complete catalog of all available labels with their metadata.
-    This should be called once and cached for efficiency.
+    The catalog is cached on disk (per identity) for LABELS_CATALOG_MAX_AGE_S
+    seconds, so repeated runs skip the LABEL_VIEW_FULL download.
 
     Args:
         labels_service: Authenticated Google Drive Labels v2 service
+        refresh: If True, ignore the disk cache and fetch from the API
 
     Returns:
-        Dictionary indexed by label_id containing full label metadata including
-        displayName, field names, and selection choices.
+        Dictionary indexed by label_id containing label metadata: displayName,
+        field names, and selection choices. Labels carry a
+        'fieldsByName' index and fields a 'choicesByName' index for
+        resolve_name_to_id().
     """
+    catalog, _ = get_labels_catalog_info(labels_service, refresh)
+    return catalog
+
+
+def get_labels_catalog_info(labels_service, refresh=False):
+    """
+    Same as get_labels_catalog(), but also report where the catalog came from.
+
+    Returns:
+        Tuple (catalog, cached_at): cached_at is the time (epoch seconds) the
+        catalog was saved if it was read from the disk cache, None if fetched now.
+    """
+    cache_path = _labels_catalog_cache_path()
+    if not refresh:
+        cached = _load_cached_json(cache_path, LABELS_CATALOG_MAX_AGE_S)
+        if cached:
+            return cached, os.path.getmtime(cache_path)
+
+    catalog = _fetch_labels_catalog(labels_service)
+    if catalog:
+        _save_cached_json(cache_path, catalog)
+    return catalog, None
+
+
+def _fetch_labels_catalog(labels_service):
+    """Download all labels from the API and index them by label, field and choice ID."""
     try:
-        response = labels_service.labels().list(view='LABEL_VIEW_FULL').execute()
-        labels = response.get('labels', [])
+        labels = []
+        page_token = None
+        while True:
+            response = execute_with_retry(labels_service.labels().list(
+                view='LABEL_VIEW_FULL',
+                pageSize=200,  # API maximum (default is 50)
+                pageToken=page_token,
+                fields=LABELS_CATALOG_FIELDS
+            ))
+            labels.extend(response.get('labels', []))
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
 
         catalog = {}
         for label in labels:
@@ -175,7 +383,6 @@ def get_labels_catalog(labels_service):
             catalog[label_id] = {
                 'id': label_id,
                 'displayName': label.get('properties', {}).get('title', 'Unknown'),
-                'description': label.get('properties', {}).get('description', ''),
                 'fields': {}
             }
 
@@ -192,12 +399,14 @@ def get_labels_catalog(labels_service):
                 for choice in selection_options.get('choices', []):
                     choice_id = choice.get('id')
                     field_info['choices'][choice_id] = {
-                        'displayName': choice.get('properties', {}).get('displayName', 'Unknown'),
-                        'description': choice.get('properties', {}).get('description', '')
+                        'displayName': choice.get('properties', {}).get('displayName', 'Unknown')
                     }
 
+                field_info['choicesByName'] = build_name_index(field_info['choices'])
                 catalog[label_id]['fields'][field_id] = field_info
 
+            catalog[label_id]['fieldsByName'] = build_name_index(catalog[label_id]['fields'])
+
         return catalog
     except Exception as e:
         return {}
@@ -217,58 +426,71 @@ def get_file_labels(drive_service, file_id, labels_catalog):
         Returns empty list if file has no labels or on error.
     """
     try:
-        response = drive_service.files().listLabels(fileId=file_id).execute()
-        labels = response.get('labels', [])
+        response = execute_with_retry(drive_service.files().listLabels(fileId=file_id))
+        return describe_labels(response.get('labels', []), labels_catalog)
+    except Exception as e:
+        # If file doesn't have labels or there's an error, return empty list
+        return []
 
-        result = []
-        for label in labels:
-            label_id = label.get('id')
 
-            # Lookup label metadata from catalog
-            label_metadata = labels_catalog.get(label_id, {})
-            label_info = {
-                'id': label_id,
-                'displayName': label_metadata.get('displayName', 'Unknown'),
-                'fields': []
-            }
+def describe_labels(labels, labels_catalog):
+    """
+    Attach display names from the catalog to raw Drive label objects.
+    Pure function: works on labels from listLabels or from files.list labelInfo.
 
-            # Extract field values from the label
-            fields = label.get('fields', {})
-            for field_id, field_values in fields.items():
-                # Lookup field metadata from catalog
-                field_metadata = label_metadata.get('fields', {}).get(field_id, {})
-                field_info = {
-                    'id': field_id,
-                    'displayName': field_metadata.get('displayName', 'Unknown'),
-                    'values': []
-                }
+    Args:
+        labels: List of Drive v3 Label objects applied to a file
+        labels_catalog: Pre-fetched labels catalog from get_labels_catalog()
 
-                # Process different field types
-                if 'selection' in field_values:
-                    # Selection field - lookup choice displayNames
-                    selections = field_values.get('selection', [])
-                    choices_metadata = field_metadata.get('choices', {})
-                    for choice_id in selections:
-                        choice_info = choices_metadata.get(choice_id, {})
-                        field_info['values'].append({
-                            'id': choice_id,
-                            'displayName': choice_info.get('displayName', choice_id)
-                        })
-                elif 'text' in field_values:
-                    field_info['values'] = field_values.get('text')
-                elif 'integer' in field_values:
-                    field_info['values'] = field_values.get('integer')
-                elif 'dateString' in field_values:
-                    field_info['values'] = field_values.get('dateString')
-                elif 'user' in field_values:
-                    field_info['values'] = field_values.get('user')
-
-                if field_info['values']:
-                    label_info['fields'].append(field_info)
-
-            result.append(label_info)
-
-        return result
-    except Exception as e:
-        # If file doesn't have labels or there's an error, return empty list
-        return []
\ No newline at end of file
+    Returns:
+        List of label dictionaries with display names and field values.
+    """
+    result = []
+    for label in labels:
+        label_id = label.get('id')
+
+        # Lookup label metadata from catalog
+        label_metadata = labels_catalog.get(label_id, {})
+        label_info = {
+            'id': label_id,
+            'displayName': label_metadata.get('displayName', 'Unknown'),
+            'fields': []
+        }
+
+        # Extract field values from the label
+        fields = label.get('fields', {})
+        for field_id, field_values in fields.items():
+            # Lookup field metadata from catalog
+            field_metadata = label_metadata.get('fields', {}).get(field_id, {})
+            field_info = {
+                'id': field_id,
+                'displayName': field_metadata.get('displayName', 'Unknown'),
+                'values': []
+            }
+
+            # Process different field types
+            if 'selection' in field_values:
+                # Selection field - lookup choice displayNames
+                selections = field_values.get('selection', [])
+                choices_metadata = field_metadata.get('choices', {})
+                for choice_id in selections:
+                    choice_info = choices_metadata.get(choice_id, {})
+                    field_info['values'].append({
+                        'id': choice_id,
+                        'displayName': choice_info.get('displayName', choice_id)
+                    })
+            elif 'text' in field_values:
+                field_info['values'] = field_values.get('text')
+            elif 'integer' in field_values:
+                field_info['values'] = field_values.get('integer')
+            elif 'dateString' in field_values:
+                field_info['values'] = field_values.get('dateString')
+            elif 'user' in field_values:
+                field_info['values'] = field_values.get('user')
+
+            if field_info['values']:
+                label_info['fields'].append(field_info)
+
+        result.append(label_info)
+
+    return result